@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+One-off migration: convert attendance dates stored as "YYYY-MM-DD" strings
+into BSON Dates at midnight UTC.
+
+Run once from the backend directory BEFORE starting a server that stores
+BSON Dates. A server running against unmigrated data misses string-dated
+records in its lookups and writes duplicates for the same student and day:
+    python migrate_attendance_dates.py
+If that already happened, the string-dated copy is deleted in favour of the
+Date record written by the newer server. Safe to re-run; records that
+already hold a Date are left untouched.
+"""
+
+from dotenv import load_dotenv
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
+import os
+import logging
+from pathlib import Path
+from datetime import datetime, date, time
+
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+DUPLICATE_KEY = 11000
+
+
+def flush(collection, ops):
+    try:
+        result = collection.bulk_write(ops, ordered=False)
+        return result.modified_count
+    except BulkWriteError as e:
+        for error in e.details["writeErrors"]:
+            if error["code"] == DUPLICATE_KEY:
+                # The day was already re-marked as a Date record; the string copy is stale
+                collection.delete_one(error["op"]["q"])
+                logger.warning("Deleted stale string-dated record %s", error["op"]["q"]["_id"])
+            else:
+                logger.error("Could not convert record %s: %s", error["op"]["q"], error["errmsg"])
+        return e.details["nModified"]
+
+
+def main():
+    client = MongoClient(os.environ['MONGO_URL'])
+    collection = client[os.environ['DB_NAME']].attendance
+    
+    converted = 0
+    ops = []
+    for record in collection.find({"date": {"$type": "string"}}, {"_id": 1, "date": 1}):
+        try:
+            day = date.fromisoformat(record["date"])
+        except ValueError:
+            logger.error("Skipping record %s with malformed date %r", record["_id"], record["date"])
+            continue
+        ops.append(UpdateOne({"_id": record["_id"]}, {"$set": {"date": datetime.combine(day, time.min)}}))
+        if len(ops) >= BATCH_SIZE:
+            converted += flush(collection, ops)
+            ops = []
+    if ops:
+        converted += flush(collection, ops)
+    
+    logger.info("Converted %d attendance records to BSON Dates", converted)
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
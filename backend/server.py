@@ -1,15 +1,20 @@
 from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from cachetools import TTLCache
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 import os
+import orjson
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import uuid
-from datetime import datetime, date
-from bson import ObjectId
+from datetime import datetime, date, time
 
 
 ROOT_DIR = Path(__file__).parent
@@ -17,31 +22,51 @@ load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=50,
+    minPoolSize=10,
+    compressors="zstd",
+    retryWrites=True
+)
 db = client[os.environ['DB_NAME']]
 
-# Create the main app without a prefix
-app = FastAPI()
+# Create the main app without a prefix, serializing responses with orjson
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+# Short-lived per-process caches for read-heavy endpoints, cleared whenever this process writes
+# the underlying data (writes handled by other workers only show up once entries expire)
+class_cache = TTLCache(maxsize=256, ttl=30)
+report_cache = TTLCache(maxsize=256, ttl=10)
+
+# Bumped on every invalidation so a fill that started before a write never stores stale data
+cache_generation = {"class": 0, "report": 0}
+
+def invalidate_class_cache():
+    cache_generation["class"] += 1
+    class_cache.clear()
+
+def invalidate_report_cache():
+    cache_generation["report"] += 1
+    report_cache.clear()
+
+
+# Pre-generated UUID strings, refilled from a single urandom read per batch
+_uuid_pool = []
+
+def next_uuid():
+    if not _uuid_pool:
+        raw = os.urandom(16 * 256)
+        _uuid_pool.extend(str(uuid.UUID(bytes=raw[i:i + 16], version=4)) for i in range(0, len(raw), 16))
+    return _uuid_pool.pop()
 
-# Helper function to convert ObjectId to string
-def objectid_to_str(obj):
-    if isinstance(obj, dict):
-        for key, value in obj.items():
-            if isinstance(value, ObjectId):
-                obj[key] = str(value)
-            elif isinstance(value, dict):
-                obj[key] = objectid_to_str(value)
-            elif isinstance(value, list):
-                obj[key] = [objectid_to_str(item) if isinstance(item, dict) else item for item in value]
-    return obj
 
 # ClassTrack Data Models
 class Student(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=next_uuid)
     name: str
     roll_number: str
     class_id: str
@@ -52,7 +77,7 @@ class StudentCreate(BaseModel):
     class_id: str
 
 class ClassInfo(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=next_uuid)
     name: str
     subject: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -62,7 +87,7 @@ class ClassCreate(BaseModel):
     subject: str
 
 class AttendanceRecord(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: str = Field(default_factory=next_uuid)
     student_id: str
     class_id: str
     date: date
@@ -75,10 +100,14 @@ class AttendanceCreate(BaseModel):
     date: date
     status: str
 
+class AttendanceBulkItem(BaseModel):
+    student_id: str
+    status: str
+
 class AttendanceBulkCreate(BaseModel):
     class_id: str
     date: date
-    attendance_records: List[dict]  # [{student_id: str, status: str}]
+    attendance_records: List[AttendanceBulkItem]
 
 # API Routes
 @api_router.get("/")
@@ -88,140 +117,236 @@ async def root():
 # Classes endpoints
 @api_router.post("/classes", response_model=ClassInfo)
 async def create_class(class_data: ClassCreate):
-    class_dict = class_data.dict()
-    class_obj = ClassInfo(**class_dict)
-    result = await db.classes.insert_one(class_obj.dict())
-    return class_obj
+    class_doc = {
+        "id": next_uuid(),
+        "name": class_data.name,
+        "subject": class_data.subject,
+        "created_at": datetime.utcnow()
+    }
+    await db.classes.insert_one(class_doc)
+    invalidate_class_cache()
+    return class_doc
 
 @api_router.get("/classes", response_model=List[ClassInfo])
 async def get_classes():
-    classes = await db.classes.find().to_list(1000)
-    return [ClassInfo(**objectid_to_str(cls)) for cls in classes]
+    cache_key = ("classes",)
+    if cache_key in class_cache:
+        return class_cache[cache_key]
+    
+    generation = cache_generation["class"]
+    classes = await db.classes.find({}, {"_id": 0}).to_list(1000)
+    result = [ClassInfo(**cls) for cls in classes]
+    if cache_generation["class"] == generation:
+        class_cache[cache_key] = result
+    return result
 
 @api_router.get("/classes/{class_id}", response_model=ClassInfo)
 async def get_class(class_id: str):
-    cls = await db.classes.find_one({"id": class_id})
+    cache_key = ("class", class_id)
+    if cache_key in class_cache:
+        return class_cache[cache_key]
+    
+    generation = cache_generation["class"]
+    cls = await db.classes.find_one({"id": class_id}, {"_id": 0})
     if not cls:
         raise HTTPException(status_code=404, detail="Class not found")
-    return ClassInfo(**objectid_to_str(cls))
+    result = ClassInfo(**cls)
+    if cache_generation["class"] == generation:
+        class_cache[cache_key] = result
+    return result
 
 # Students endpoints
 @api_router.post("/students", response_model=Student)
 async def create_student(student_data: StudentCreate):
-    student_dict = student_data.dict()
-    student_obj = Student(**student_dict)
-    result = await db.students.insert_one(student_obj.dict())
-    return student_obj
+    student_doc = {
+        "id": next_uuid(),
+        "name": student_data.name,
+        "roll_number": student_data.roll_number,
+        "class_id": student_data.class_id
+    }
+    await db.students.insert_one(student_doc)
+    invalidate_report_cache()
+    return student_doc
 
 @api_router.get("/students", response_model=List[Student])
-async def get_students(class_id: Optional[str] = None):
+async def get_students(class_id: Optional[str] = None, ids: Optional[str] = None):
     query = {}
     if class_id:
         query["class_id"] = class_id
-    students = await db.students.find(query).to_list(1000)
-    return [Student(**objectid_to_str(student)) for student in students]
+    if ids is not None:
+        # Comma-separated ids let callers fetch several students in one request
+        id_list = [i.strip() for i in ids.split(",") if i.strip()]
+        if not id_list:
+            return []
+        query["id"] = {"$in": id_list}
+    students = await db.students.find(query, {"_id": 0}).to_list(1000)
+    return [Student(**student) for student in students]
 
 @api_router.get("/students/{student_id}", response_model=Student)
 async def get_student(student_id: str):
-    student = await db.students.find_one({"id": student_id})
+    student = await db.students.find_one({"id": student_id}, {"_id": 0})
     if not student:
         raise HTTPException(status_code=404, detail="Student not found")
-    return Student(**objectid_to_str(student))
+    return Student(**student)
 
 # Attendance endpoints
 @api_router.post("/attendance", response_model=AttendanceRecord)
 async def mark_attendance(attendance_data: AttendanceCreate):
-    # Check if attendance already exists for this student, class, and date
-    existing = await db.attendance.find_one({
-        "student_id": attendance_data.student_id,
-        "class_id": attendance_data.class_id,
-        "date": attendance_data.date.isoformat()
-    })
-    
-    attendance_dict = attendance_data.dict()
-    attendance_dict["date"] = attendance_data.date.isoformat()
+    # Dates are stored as BSON Dates at midnight UTC so range queries stay on the index
+    day_start = datetime.combine(attendance_data.date, time.min)
+    now_iso = datetime.utcnow().isoformat()
     
-    if existing:
-        # Update existing attendance
-        await db.attendance.update_one(
-            {"id": existing["id"]},
-            {"$set": {
-                "status": attendance_data.status,
-                "marked_at": datetime.utcnow().isoformat()
-            }}
-        )
-        existing.update({
-            "status": attendance_data.status,
-            "marked_at": datetime.utcnow().isoformat()
-        })
-        return AttendanceRecord(**objectid_to_str(existing))
-    else:
-        # Create new attendance record
-        attendance_obj = AttendanceRecord(**attendance_dict)
-        # Convert the attendance object to dict and ensure date is string
-        attendance_doc = attendance_obj.dict()
-        attendance_doc["date"] = attendance_data.date.isoformat()
-        attendance_doc["marked_at"] = datetime.utcnow().isoformat()
-        result = await db.attendance.insert_one(attendance_doc)
-        return attendance_obj
+    # Update or create the student's record for this day in a single atomic round-trip
+    attendance_doc = await db.attendance.find_one_and_update(
+        {
+            "student_id": attendance_data.student_id,
+            "class_id": attendance_data.class_id,
+            "date": day_start
+        },
+        {
+            "$set": {"status": attendance_data.status, "marked_at": now_iso},
+            "$setOnInsert": {"id": next_uuid()}
+        },
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    invalidate_report_cache()
+    attendance_doc["date"] = attendance_data.date
+    return attendance_doc
 
 @api_router.post("/attendance/bulk")
 async def mark_bulk_attendance(bulk_data: AttendanceBulkCreate):
-    results = []
-    for record in bulk_data.attendance_records:
-        attendance_data = AttendanceCreate(
-            student_id=record["student_id"],
-            class_id=bulk_data.class_id,
-            date=bulk_data.date,
-            status=record["status"]
+    day_start = datetime.combine(bulk_data.date, time.min)
+    now_iso = datetime.utcnow().isoformat()
+    
+    # Upsert every record in a single round-trip instead of one find + write per student
+    ops = [
+        UpdateOne(
+            {
+                "student_id": record.student_id,
+                "class_id": bulk_data.class_id,
+                "date": day_start
+            },
+            {
+                "$set": {"status": record.status, "marked_at": now_iso},
+                "$setOnInsert": {"id": next_uuid()}
+            },
+            upsert=True
         )
-        result = await mark_attendance(attendance_data)
-        results.append(result)
+        for record in bulk_data.attendance_records
+    ]
+    if ops:
+        try:
+            await db.attendance.bulk_write(ops, ordered=False)
+        finally:
+            # An unordered bulk write that fails part-way has still applied the other upserts
+            invalidate_report_cache()
+    
+    results = [
+        {
+            "student_id": record.student_id,
+            "class_id": bulk_data.class_id,
+            "date": bulk_data.date,
+            "status": record.status,
+            "marked_at": now_iso
+        }
+        for record in bulk_data.attendance_records
+    ]
     return {"message": f"Marked attendance for {len(results)} students", "records": results}
 
 @api_router.get("/attendance")
-async def get_attendance(class_id: str, date: Optional[str] = None):
+async def get_attendance(class_id: str, date: Optional[date] = None):
     query = {"class_id": class_id}
     if date:
-        query["date"] = date
+        query["date"] = datetime.combine(date, time.min)
+    
+    def encode(record):
+        # Records not yet converted by migrate_attendance_dates.py still hold ISO strings
+        if isinstance(record["date"], datetime):
+            record["date"] = record["date"].date()
+        return orjson.dumps(record)
+    
+    # Fetch the first record before streaming so a failure opening the cursor is still a 500
+    cursor = db.attendance.find(query, {"_id": 0})
+    try:
+        first_record = await cursor.next()
+    except StopAsyncIteration:
+        first_record = None
     
-    attendance_records = await db.attendance.find(query).to_list(1000)
-    return [objectid_to_str(record) for record in attendance_records]
+    # Stream the rest straight off the cursor instead of buffering the whole result set; a
+    # later cursor error propagates and drops the connection so the client sees a failed read
+    async def stream_records():
+        yield b"["
+        if first_record is not None:
+            yield encode(first_record)
+            async for record in cursor:
+                yield b","
+                yield encode(record)
+        yield b"]"
+    
+    return StreamingResponse(stream_records(), media_type="application/json")
 
 # Reports endpoints
 @api_router.get("/reports/{class_id}")
-async def get_class_report(class_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None):
+async def get_class_report(class_id: str, start_date: Optional[date] = None, end_date: Optional[date] = None):
+    cache_key = (class_id, start_date, end_date)
+    if cache_key in report_cache:
+        return report_cache[cache_key]
+    
+    generation = cache_generation["report"]
     # Get class info
-    cls = await db.classes.find_one({"id": class_id})
+    cls = await db.classes.find_one({"id": class_id}, {"_id": 0})
     if not cls:
         raise HTTPException(status_code=404, detail="Class not found")
     
-    # Get students in class
-    students = await db.students.find({"class_id": class_id}).to_list(1000)
-    
-    # Build date filter
-    date_filter = {"class_id": class_id}
+    # Constant class and date bounds stay in a plain $match so they can use the (class_id, date) index
+    attendance_match = {"class_id": class_id}
+    date_range = {}
     if start_date:
-        date_filter["date"] = {"$gte": start_date}
+        date_range["$gte"] = datetime.combine(start_date, time.min)
     if end_date:
-        if "date" in date_filter:
-            date_filter["date"]["$lte"] = end_date
-        else:
-            date_filter["date"] = {"$lte": end_date}
-    
-    # Get attendance records
-    attendance_records = await db.attendance.find(date_filter).to_list(1000)
+        date_range["$lte"] = datetime.combine(end_date, time.min)
+    if date_range:
+        attendance_match["date"] = date_range
     
-    # Calculate statistics for each student
+    # Fetch students and their attendance counts in a single aggregation
+    pipeline = [
+        {"$match": {"class_id": class_id}},
+        {"$lookup": {
+            "from": "attendance",
+            "let": {"sid": "$id"},
+            "pipeline": [
+                {"$match": attendance_match},
+                {"$match": {"$expr": {"$eq": ["$student_id", "$$sid"]}}},
+                {"$group": {
+                    "_id": None,
+                    "total": {"$sum": 1},
+                    "present": {"$sum": {"$cond": [{"$eq": ["$status", "present"]}, 1, 0]}},
+                    "absent": {"$sum": {"$cond": [{"$eq": ["$status", "absent"]}, 1, 0]}},
+                    "late": {"$sum": {"$cond": [{"$eq": ["$status", "late"]}, 1, 0]}}
+                }}
+            ],
+            "as": "stats"
+        }},
+        {"$project": {
+            "_id": 0,
+            "id": 1,
+            "name": 1,
+            "roll_number": 1,
+            "stats": {"$arrayElemAt": ["$stats", 0]}
+        }}
+    ]
+    # Calculate statistics for each student as the cursor yields them
     student_stats = {}
-    for student in students:
+    async for student in db.students.aggregate(pipeline):
         student_id = student["id"]
-        student_attendance = [record for record in attendance_records if record["student_id"] == student_id]
+        counts = student.get("stats") or {}
         
-        total_days = len(student_attendance)
-        present_count = len([r for r in student_attendance if r["status"] == "present"])
-        absent_count = len([r for r in student_attendance if r["status"] == "absent"])
-        late_count = len([r for r in student_attendance if r["status"] == "late"])
+        total_days = counts.get("total", 0)
+        present_count = counts.get("present", 0)
+        absent_count = counts.get("absent", 0)
+        late_count = counts.get("late", 0)
         
         attendance_percentage = (present_count / total_days * 100) if total_days > 0 else 0
         
@@ -235,14 +360,17 @@ async def get_class_report(class_id: str, start_date: Optional[str] = None, end_
             "attendance_percentage": round(attendance_percentage, 2)
         }
     
-    return {
-        "class_info": objectid_to_str(cls),
+    report = {
+        "class_info": cls,
         "report_period": {
             "start_date": start_date,
             "end_date": end_date
         },
         "student_statistics": student_stats
     }
+    if cache_generation["report"] == generation:
+        report_cache[cache_key] = report
+    return report
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -255,6 +383,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger JSON payloads such as attendance lists and class reports
+app.add_middleware(GZipMiddleware, minimum_size=512, compresslevel=4)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -262,6 +393,31 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    # Unique lookup key for a student's attendance on a given day (also keeps bulk upserts race-safe)
+    try:
+        await db.attendance.create_index([("student_id", 1), ("class_id", 1), ("date", 1)], unique=True)
+    except DuplicateKeyError:
+        # Older deployments could store the same day twice; report them and keep serving
+        duplicates = await db.attendance.aggregate([
+            {"$group": {
+                "_id": {"student_id": "$student_id", "class_id": "$class_id", "date": "$date"},
+                "count": {"$sum": 1}
+            }},
+            {"$match": {"count": {"$gt": 1}}},
+            {"$limit": 50}
+        ]).to_list(None)
+        logger.error(
+            "Unique attendance index not created; remove duplicate records and restart: %s",
+            [duplicate["_id"] for duplicate in duplicates]
+        )
+    await db.attendance.create_index([("class_id", 1), ("date", 1)])
+    await db.attendance.create_index("id", unique=True)
+    await db.students.create_index("class_id")
+    await db.students.create_index("id", unique=True)
+    await db.classes.create_index("id", unique=True)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
@@ -4,7 +4,8 @@ Comprehensive Backend API Tests for ClassTrack Attendance App
 Tests all endpoints with realistic data and edge cases
 """
 
-import requests
+import asyncio
+import httpx
 import json
 from datetime import datetime, date, timedelta
 import uuid
@@ -16,7 +17,7 @@ BASE_URL = "https://classtrack-app-1.preview.emergentagent.com/api"
 class ClassTrackAPITester:
     def __init__(self):
         self.base_url = BASE_URL
-        self.session = requests.Session()
+        self.client = httpx.AsyncClient(base_url=BASE_URL, http2=True)
         self.created_classes = []
         self.created_students = []
         self.test_results = []
@@ -38,10 +39,10 @@ class ClassTrackAPITester:
             print(f"   Response: {data}")
         print()
 
-    def test_api_health(self):
+    async def test_api_health(self):
         """Test 1: API Health Check"""
         try:
-            response = self.session.get(f"{self.base_url}/")
+            response = await self.client.get("/")
             if response.status_code == 200:
                 data = response.json()
                 if "ClassTrack API is running" in data.get("message", ""):
@@ -57,7 +58,7 @@ class ClassTrackAPITester:
             self.log_test("API Health Check", False, f"Connection error: {str(e)}")
             return False
 
-    def test_create_classes(self):
+    async def test_create_classes(self):
         """Test 2: Create Sample Classes"""
         classes_to_create = [
             {"name": "2nd Year Physics", "subject": "Physics"},
@@ -65,10 +66,17 @@ class ClassTrackAPITester:
             {"name": "1st Year Chemistry", "subject": "Chemistry"}
         ]
         
+        # The creations are independent, so send them concurrently
+        responses = await asyncio.gather(
+            *[self.client.post("/classes", json=class_data) for class_data in classes_to_create],
+            return_exceptions=True
+        )
+        
         all_success = True
-        for class_data in classes_to_create:
+        for class_data, response in zip(classes_to_create, responses):
             try:
-                response = self.session.post(f"{self.base_url}/classes", json=class_data)
+                if isinstance(response, Exception):
+                    raise response
                 if response.status_code == 200:
                     created_class = response.json()
                     self.created_classes.append(created_class)
@@ -84,10 +92,10 @@ class ClassTrackAPITester:
         
         return all_success
 
-    def test_get_classes(self):
+    async def test_get_classes(self):
         """Test 3: Get All Classes"""
         try:
-            response = self.session.get(f"{self.base_url}/classes")
+            response = await self.client.get("/classes")
             if response.status_code == 200:
                 classes = response.json()
                 if len(classes) >= len(self.created_classes):
@@ -106,7 +114,7 @@ class ClassTrackAPITester:
             self.log_test("Get All Classes", False, f"Error: {str(e)}")
             return False
 
-    def test_get_specific_class(self):
+    async def test_get_specific_class(self):
         """Test 4: Get Specific Class"""
         if not self.created_classes:
             self.log_test("Get Specific Class", False, "No classes available to test")
@@ -114,7 +122,7 @@ class ClassTrackAPITester:
             
         class_to_test = self.created_classes[0]
         try:
-            response = self.session.get(f"{self.base_url}/classes/{class_to_test['id']}")
+            response = await self.client.get(f"/classes/{class_to_test['id']}")
             if response.status_code == 200:
                 class_data = response.json()
                 if class_data['id'] == class_to_test['id']:
@@ -132,7 +140,7 @@ class ClassTrackAPITester:
             self.log_test("Get Specific Class", False, f"Error: {str(e)}")
             return False
 
-    def test_create_students(self):
+    async def test_create_students(self):
         """Test 5: Create Sample Students"""
         if not self.created_classes:
             self.log_test("Create Students", False, "No classes available")
@@ -153,10 +161,17 @@ class ClassTrackAPITester:
             {"name": "Grace Taylor", "roll_number": "CH2022002", "class_id": self.created_classes[2]['id']},
         ]
         
+        # The creations are independent, so send them concurrently
+        responses = await asyncio.gather(
+            *[self.client.post("/students", json=student_data) for student_data in students_data],
+            return_exceptions=True
+        )
+        
         all_success = True
-        for student_data in students_data:
+        for student_data, response in zip(students_data, responses):
             try:
-                response = self.session.post(f"{self.base_url}/students", json=student_data)
+                if isinstance(response, Exception):
+                    raise response
                 if response.status_code == 200:
                     created_student = response.json()
                     self.created_students.append(created_student)
@@ -172,7 +187,7 @@ class ClassTrackAPITester:
         
         return all_success
 
-    def test_get_students_by_class(self):
+    async def test_get_students_by_class(self):
         """Test 6: Get Students by Class"""
         if not self.created_classes:
             self.log_test("Get Students by Class", False, "No classes available")
@@ -180,7 +195,7 @@ class ClassTrackAPITester:
             
         class_to_test = self.created_classes[0]  # Physics class
         try:
-            response = self.session.get(f"{self.base_url}/students?class_id={class_to_test['id']}")
+            response = await self.client.get(f"/students?class_id={class_to_test['id']}")
             if response.status_code == 200:
                 students = response.json()
                 physics_students = [s for s in self.created_students if s['class_id'] == class_to_test['id']]
@@ -200,7 +215,38 @@ class ClassTrackAPITester:
             self.log_test("Get Students by Class", False, f"Error: {str(e)}")
             return False
 
-    def test_get_specific_student(self):
+    async def test_get_students_by_ids(self):
+        """Test 6b: Get Students by IDs"""
+        if len(self.created_students) < 2:
+            self.log_test("Get Students by IDs", False, "Need at least two students")
+            return False
+            
+        expected_ids = {student['id'] for student in self.created_students[:2]}
+        first_id, second_id = sorted(expected_ids)
+        try:
+            # Whitespace and empty entries in the list are ignored
+            response = await self.client.get(f"/students?ids={first_id}, {second_id},")
+            empty_response = await self.client.get("/students?ids=")
+            if response.status_code == 200 and empty_response.status_code == 200:
+                returned_ids = {student['id'] for student in response.json()}
+                if returned_ids == expected_ids and empty_response.json() == []:
+                    self.log_test("Get Students by IDs", True, 
+                                f"Retrieved {len(returned_ids)} students in one request")
+                    return True
+                else:
+                    self.log_test("Get Students by IDs", False, 
+                                f"Expected {sorted(expected_ids)} and no students for empty ids",
+                                {"ids": sorted(returned_ids), "empty": empty_response.json()})
+                    return False
+            else:
+                self.log_test("Get Students by IDs", False, 
+                            f"Status codes: {response.status_code}, {empty_response.status_code}", response.text)
+                return False
+        except Exception as e:
+            self.log_test("Get Students by IDs", False, f"Error: {str(e)}")
+            return False
+
+    async def test_get_specific_student(self):
         """Test 7: Get Specific Student"""
         if not self.created_students:
             self.log_test("Get Specific Student", False, "No students available")
@@ -208,7 +254,7 @@ class ClassTrackAPITester:
             
         student_to_test = self.created_students[0]
         try:
-            response = self.session.get(f"{self.base_url}/students/{student_to_test['id']}")
+            response = await self.client.get(f"/students/{student_to_test['id']}")
             if response.status_code == 200:
                 student_data = response.json()
                 if student_data['id'] == student_to_test['id']:
@@ -226,7 +272,7 @@ class ClassTrackAPITester:
             self.log_test("Get Specific Student", False, f"Error: {str(e)}")
             return False
 
-    def test_individual_attendance(self):
+    async def test_individual_attendance(self):
         """Test 8: Mark Individual Attendance"""
         if not self.created_students or not self.created_classes:
             self.log_test("Individual Attendance", False, "No students or classes available")
@@ -244,9 +290,13 @@ class ClassTrackAPITester:
         }
         
         try:
-            response = self.session.post(f"{self.base_url}/attendance", json=attendance_data)
+            response = await self.client.post("/attendance", json=attendance_data)
             if response.status_code == 200:
                 attendance_record = response.json()
+                if attendance_record.get('date') != today:
+                    self.log_test("Individual Attendance", False, 
+                                f"Expected date {today}", attendance_record)
+                    return False
                 self.log_test("Individual Attendance", True, 
                             f"Marked {student['name']} as present")
                 return True
@@ -258,7 +308,7 @@ class ClassTrackAPITester:
             self.log_test("Individual Attendance", False, f"Error: {str(e)}")
             return False
 
-    def test_bulk_attendance(self):
+    async def test_bulk_attendance(self):
         """Test 9: Mark Bulk Attendance"""
         if not self.created_students or not self.created_classes:
             self.log_test("Bulk Attendance", False, "No students or classes available")
@@ -289,7 +339,7 @@ class ClassTrackAPITester:
         }
         
         try:
-            response = self.session.post(f"{self.base_url}/attendance/bulk", json=bulk_data)
+            response = await self.client.post("/attendance/bulk", json=bulk_data)
             if response.status_code == 200:
                 result = response.json()
                 self.log_test("Bulk Attendance", True, 
@@ -303,7 +353,7 @@ class ClassTrackAPITester:
             self.log_test("Bulk Attendance", False, f"Error: {str(e)}")
             return False
 
-    def test_get_attendance(self):
+    async def test_get_attendance(self):
         """Test 10: Get Attendance Records"""
         if not self.created_classes:
             self.log_test("Get Attendance", False, "No classes available")
@@ -313,9 +363,15 @@ class ClassTrackAPITester:
         today = date.today().isoformat()
         
         try:
-            response = self.session.get(f"{self.base_url}/attendance?class_id={physics_class['id']}&date={today}")
+            response = await self.client.get(f"/attendance?class_id={physics_class['id']}&date={today}")
             if response.status_code == 200:
                 attendance_records = response.json()
+                # Dates are stored as BSON Dates but must still come back as YYYY-MM-DD
+                bad_dates = [r.get('date') for r in attendance_records if r.get('date') != today]
+                if bad_dates:
+                    self.log_test("Get Attendance", False, 
+                                f"Expected every date to be {today}", bad_dates)
+                    return False
                 self.log_test("Get Attendance", True, 
                             f"Retrieved {len(attendance_records)} attendance records")
                 return True
@@ -327,7 +383,7 @@ class ClassTrackAPITester:
             self.log_test("Get Attendance", False, f"Error: {str(e)}")
             return False
 
-    def test_class_report(self):
+    async def test_class_report(self):
         """Test 11: Generate Class Report"""
         if not self.created_classes:
             self.log_test("Class Report", False, "No classes available")
@@ -338,8 +394,8 @@ class ClassTrackAPITester:
         end_date = date.today().isoformat()
         
         try:
-            response = self.session.get(
-                f"{self.base_url}/reports/{physics_class['id']}?start_date={start_date}&end_date={end_date}"
+            response = await self.client.get(
+                f"/reports/{physics_class['id']}?start_date={start_date}&end_date={end_date}"
             )
             if response.status_code == 200:
                 report = response.json()
@@ -358,14 +414,14 @@ class ClassTrackAPITester:
             self.log_test("Class Report", False, f"Error: {str(e)}")
             return False
 
-    def test_error_handling(self):
+    async def test_error_handling(self):
         """Test 12: Error Handling and Edge Cases"""
         tests_passed = 0
         total_tests = 3
         
         # Test 1: Get non-existent class
         try:
-            response = self.session.get(f"{self.base_url}/classes/non-existent-id")
+            response = await self.client.get("/classes/non-existent-id")
             if response.status_code == 404:
                 self.log_test("Error Handling - Non-existent Class", True, "Correctly returned 404")
                 tests_passed += 1
@@ -377,7 +433,7 @@ class ClassTrackAPITester:
         
         # Test 2: Get non-existent student
         try:
-            response = self.session.get(f"{self.base_url}/students/non-existent-id")
+            response = await self.client.get("/students/non-existent-id")
             if response.status_code == 404:
                 self.log_test("Error Handling - Non-existent Student", True, "Correctly returned 404")
                 tests_passed += 1
@@ -389,7 +445,7 @@ class ClassTrackAPITester:
         
         # Test 3: Get report for non-existent class
         try:
-            response = self.session.get(f"{self.base_url}/reports/non-existent-id")
+            response = await self.client.get("/reports/non-existent-id")
             if response.status_code == 404:
                 self.log_test("Error Handling - Non-existent Class Report", True, "Correctly returned 404")
                 tests_passed += 1
@@ -401,7 +457,7 @@ class ClassTrackAPITester:
         
         return tests_passed == total_tests
 
-    def run_all_tests(self):
+    async def run_all_tests(self):
         """Run all tests in sequence"""
         print("=" * 60)
         print("ClassTrack Backend API Comprehensive Test Suite")
@@ -416,6 +472,7 @@ class ClassTrackAPITester:
             self.test_get_specific_class,
             self.test_create_students,
             self.test_get_students_by_class,
+            self.test_get_students_by_ids,
             self.test_get_specific_student,
             self.test_individual_attendance,
             self.test_bulk_attendance,
@@ -427,9 +484,12 @@ class ClassTrackAPITester:
         passed_tests = 0
         total_tests = len(test_methods)
         
-        for test_method in test_methods:
-            if test_method():
-                passed_tests += 1
+        try:
+            for test_method in test_methods:
+                if await test_method():
+                    passed_tests += 1
+        finally:
+            await self.client.aclose()
         
         print("=" * 60)
         print("TEST SUMMARY")
@@ -449,7 +509,7 @@ class ClassTrackAPITester:
 def main():
     """Main function to run the tests"""
     tester = ClassTrackAPITester()
-    success = tester.run_all_tests()
+    success = asyncio.run(tester.run_all_tests())
     
     # Return appropriate exit code
     sys.exit(0 if success else 1)